@@ -1,11 +1,42 @@
-import os
+from __future__ import annotations
+
+import ast
+import hashlib
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from io import BytesIO
 from datetime import datetime, date
 
+import httplib2
+import numpy as np
 import streamlit as st
 import pandas as pd
 from googleapiclient.discovery import build
 
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional; the regex path covers it
+    njit = prange = None
+
+try:  # orjson is optional; stdlib json parsing works, just slower
+    import json as _json
+    import orjson
+    import googleapiclient.http as _gapi_http
+    import googleapiclient.model as _gapi_model
+
+    class _OrjsonShim:
+        # Response parsing is the hot path; request bodies keep stdlib dumps
+        # since orjson.dumps does not accept the stdlib keyword arguments.
+        loads = staticmethod(orjson.loads)
+        dumps = staticmethod(_json.dumps)
+        decoder = _json.decoder
+        JSONDecodeError = _json.JSONDecodeError
+
+    _gapi_http.json = _gapi_model.json = _OrjsonShim
+except ImportError:
+    pass
+
 # ---------- CONSTANTS ----------
 DEFAULT_VIEW_BRACKETS = {
     "1K-5K": (1_000, 5_000),
@@ -19,9 +50,83 @@ DEFAULT_VIEW_BRACKETS = {
     "1M+": (1_000_000, float("inf")),
 }
 SHORTS_LIMIT_SEC_DEFAULT = 180
+_DURATION_RE = re.compile(r"P(?:(\d+)D)?T?(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?")
+
+
+@lru_cache(maxsize=8)
+def _bracket_bins(bracket_items: tuple) -> tuple[list[str], list[float] | None]:
+    # Streamlit reruns this module's callers on every widget change; memoize
+    # the labels/edges derived from a bracket dict instead of rebuilding them.
+    # edges is None when the brackets are not contiguous ascending — custom
+    # dicts may have gaps or arbitrary order, and pd.cut cannot express that.
+    labels = [name for name, _ in bracket_items]
+    bounds = [b for _, b in bracket_items]
+    contiguous = all(lo < hi for lo, hi in bounds) and all(
+        bounds[i][1] == bounds[i + 1][0] for i in range(len(bounds) - 1)
+    )
+    if not contiguous:
+        return labels, None
+    return labels, [lo for lo, _ in bounds] + [bounds[-1][1]]
+
+if njit is not None:
+
+    @njit(cache=True, parallel=True)
+    def _durations_to_seconds(buf: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        # Scan the concatenated ASCII durations: accumulate digit runs and
+        # multiply-add on each H/M/S marker. One pass, no allocations per row.
+        out = np.zeros(offsets.size - 1, dtype=np.int32)
+        for i in prange(offsets.size - 1):
+            total = 0
+            num = 0
+            for j in range(offsets[i], offsets[i + 1]):
+                c = buf[j]
+                if 48 <= c <= 57:  # '0'-'9'
+                    num = num * 10 + (c - 48)
+                elif c == 68:  # 'D' (>24h livestream VODs)
+                    total += num * 86400
+                    num = 0
+                elif c == 72:  # 'H'
+                    total += num * 3600
+                    num = 0
+                elif c == 77:  # 'M'
+                    total += num * 60
+                    num = 0
+                elif c == 83:  # 'S'
+                    total += num
+                    num = 0
+                else:  # 'P' / 'T'
+                    num = 0
+            out[i] = total
+        return out
+
+
+def _parse_duration_seconds(durs: pd.Series) -> np.ndarray:
+    if njit is not None:
+        buf = np.frombuffer("".join(durs).encode("ascii"), dtype=np.uint8)
+        offsets = np.zeros(len(durs) + 1, dtype=np.int64)
+        np.cumsum([len(d) for d in durs], out=offsets[1:])
+        return _durations_to_seconds(buf, offsets)
+    # One C-level regex scan over the column instead of N check_if_short calls.
+    dhms = durs.str.extract(_DURATION_RE).fillna("0").astype(np.int32)
+    return (
+        dhms[0].to_numpy() * 86400
+        + dhms[1].to_numpy() * 3600
+        + dhms[2].to_numpy() * 60
+        + dhms[3].to_numpy()
+    )
+
 
 # ---------- DATA HELPERS ----------
+@st.cache_resource
+def get_yt_client(api_key: str):
+    # static_discovery uses the bundled discovery doc, so building the
+    # service makes no HTTP call at all; cache it per key across reruns.
+    return build("youtube", "v3", developerKey=api_key, cache_discovery=False, static_discovery=True)
+
+
+
 def check_if_short(duration_iso: str, limit_sec: int = SHORTS_LIMIT_SEC_DEFAULT) -> bool:
+    # Scalar fallback; the hot path classifies whole columns in get_video_details.
     h = m = s = 0
     d = duration_iso.replace("PT", "")
     if "H" in d:
@@ -35,93 +140,184 @@ def check_if_short(duration_iso: str, limit_sec: int = SHORTS_LIMIT_SEC_DEFAULT)
     return h * 3600 + m * 60 + s <= limit_sec
 
 
-def get_all_video_ids(api, channel_id: str) -> list[str]:
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_all_video_ids(_api, api_key_hash: str, channel_id: str, start_date: date, end_date: date) -> list[str]:
     uploads_id = (
-        api.channels()
+        _api.channels()
         .list(part="contentDetails", id=channel_id)
         .execute()["items"][0]["contentDetails"]["relatedPlaylists"]["uploads"]
     )
-    ids, nxt = [], None
+    ids, nxt, past_range = [], None, False
     while True:
         pl = (
-            api.playlistItems()
-            .list(part="contentDetails", playlistId=uploads_id, maxResults=50, pageToken=nxt)
+            _api.playlistItems()
+            .list(
+                part="contentDetails",
+                playlistId=uploads_id,
+                maxResults=50,
+                pageToken=nxt,
+                fields="items(contentDetails(videoId,videoPublishedAt)),nextPageToken",
+            )
             .execute()
         )
-        ids.extend(i["contentDetails"]["videoId"] for i in pl["items"])
+        for itm in pl["items"]:
+            cd = itm["contentDetails"]
+            pub_str = cd.get("videoPublishedAt")
+            if pub_str:
+                pub = datetime.fromisoformat(pub_str.rstrip("Z")).date()
+                if pub < start_date:
+                    # Uploads come back newest-first; every later page is older.
+                    past_range = True
+                    break
+                if pub > end_date:
+                    continue
+            ids.append(cd["videoId"])
         nxt = pl.get("nextPageToken")
-        if not nxt:
+        if past_range or not nxt:
             break
     return ids
 
 
-def get_video_details(api, video_ids: list[str], short_limit: int) -> pd.DataFrame:
-    rows = []
-    for i in range(0, len(video_ids), 50):
-        resp = (
-            api.videos()
-            .list(part="snippet,statistics,contentDetails", id=",".join(video_ids[i : i + 50]))
-            .execute()
+@st.cache_data(persist="disk", show_spinner=False)
+def _fetch_video_batch(_api, api_key_hash: str, ids_batch: tuple[str, ...]) -> list[dict]:
+    # httplib2 connections are not threadsafe; give each call its own.
+    return (
+        _api.videos()
+        .list(
+            part="snippet,statistics,contentDetails",
+            id=",".join(ids_batch),
+            fields="items(id,snippet(title,publishedAt),statistics(viewCount),contentDetails(duration))",
         )
-        for itm in resp["items"]:
-            pub_dt = datetime.strptime(itm["snippet"]["publishedAt"], "%Y-%m-%dT%H:%M:%SZ")
-            iso_dur = itm["contentDetails"]["duration"]
-            rows.append(
-                {
-                    "video_id": itm["id"],
-                    "title": itm["snippet"]["title"],
-                    "published_date": pub_dt.date(),
-                    "month": pub_dt.strftime("%B %Y"),
-                    "view_count": int(itm["statistics"].get("viewCount", 0)),
-                    "duration_iso": iso_dur,
-                    "form": "Short" if check_if_short(iso_dur, short_limit) else "Long",
-                }
-            )
-    return pd.DataFrame(rows)
+        .execute(http=httplib2.Http())["items"]
+    )
 
 
-def monthly_summary(df: pd.DataFrame) -> pd.DataFrame:
-    g = df.groupby("month")
-    return (
-        pd.DataFrame(
-            {
-                "total_videos": g.size(),
-                "shorts": g.apply(lambda x: (x["form"] == "Short").sum()),
-                "longs": g.apply(lambda x: (x["form"] == "Long").sum()),
-                "total_views": g["view_count"].sum(),
-                "avg_views": g["view_count"].mean().astype(int),
-            }
-        )
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_video_details(_api, api_key_hash: str, video_ids: tuple[str, ...], short_limit: int) -> pd.DataFrame:
+    batches = [tuple(video_ids[i : i + 50]) for i in range(0, len(video_ids), 50)]
+
+    def fetch(batch: tuple[str, ...]) -> list[dict]:
+        return _fetch_video_batch(_api, api_key_hash, batch)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        items = [itm for batch_items in pool.map(fetch, batches) for itm in batch_items]
+
+    # Structure-of-arrays: one typed list per column, so pandas takes the
+    # fast dict-of-arrays constructor path instead of re-inferring per-row dicts.
+    ids, titles, pub_strs, views, durs = [], [], [], [], []
+    for itm in items:
+        ids.append(itm["id"])
+        titles.append(itm["snippet"]["title"])
+        pub_strs.append(itm["snippet"]["publishedAt"])
+        views.append(int(itm["statistics"].get("viewCount", 0)))
+        durs.append(itm["contentDetails"]["duration"])
+
+    pub_dt = pd.to_datetime(pub_strs, format="%Y-%m-%dT%H:%M:%SZ", cache=True, utc=True)
+    df = pd.DataFrame(
+        {
+            "video_id": ids,
+            "title": titles,
+            "published_date": pub_dt.date,
+            "month": pub_dt.strftime("%B %Y"),
+            "view_count": np.asarray(views, dtype=np.int64),
+            "duration_iso": durs,
+        }
+    )
+    # month and form have few uniques: category dtype stores int codes per
+    # row instead of object pointers and feeds groupby its fast path.
+    df["month"] = df["month"].astype("category")
+    secs = _parse_duration_seconds(df["duration_iso"])
+    is_short = secs <= short_limit
+    df["form"] = pd.Categorical(
+        np.where(is_short, "Short", "Long"), categories=["Short", "Long"]
+    )
+    # int8 flag so the monthly shorts count is a plain Cython sum.
+    df["is_short"] = is_short.astype(np.int8)
+    return df
+
+
+def monthly_reports(df: pd.DataFrame, brackets: dict) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # Summary and bracket split in one pass over month/view_count/form
+    # instead of two separate scans of the DataFrame.
+    labels, edges = _bracket_bins(tuple(brackets.items()))
+
+    out = df.groupby("month", sort=False, observed=True).agg(
+        total_videos=("view_count", "count"),
+        total_views=("view_count", "sum"),
+        avg_views=("view_count", "mean"),
+        shorts=("is_short", "sum"),
+    )
+    out["longs"] = out["total_videos"] - out["shorts"]
+    out["avg_views"] = out["avg_views"].astype(np.int64)
+    summary = (
+        out[["total_videos", "shorts", "longs", "total_views", "avg_views"]]
         .reset_index()
         .sort_values("month")
     )
 
-
-def view_bracket_split(df: pd.DataFrame, brackets: dict) -> pd.DataFrame:
-    out = []
-    for m, sub in df.groupby("month"):
-        row = {"month": m}
-        for name, (lo, hi) in brackets.items():
-            row[name] = sub[(sub["view_count"] >= lo) & (sub["view_count"] < hi)].shape[0]
-        out.append(row)
-    return pd.DataFrame(out).sort_values("month")
+    if edges is not None:
+        # Contiguous ascending brackets: one C-level binary search via pd.cut
+        # instead of a mask per (month, bracket).
+        bucket = pd.cut(df["view_count"], bins=edges, labels=labels, right=False)
+        bracket_df = pd.crosstab(df["month"], bucket).reindex(
+            index=pd.unique(df["month"]), columns=labels, fill_value=0
+        )
+    else:
+        # Gapped, overlapping or unordered custom brackets: count each one
+        # independently, like the original per-bracket masks.
+        v = df["view_count"].to_numpy()
+        flags = {name: (v >= lo) & (v < hi) for name, (lo, hi) in brackets.items()}
+        bracket_df = (
+            pd.DataFrame(flags, index=pd.Index(df["month"], name="month"))
+            .groupby(level=0, observed=True)
+            .sum()
+            .reindex(pd.unique(df["month"]), fill_value=0)
+        )
+    bracket_df = bracket_df.reset_index().sort_values("month")
+    return summary, bracket_df
 
 
 def top_n(df: pd.DataFrame, n=20) -> pd.DataFrame:
-    top = df.nlargest(n, "view_count")[["title", "view_count", "video_id", "month"]].copy()
-    top["url"] = "https://youtu.be/" + top["video_id"]
+    # O(N) argpartition for the k winners, then sort only those k —
+    # nlargest sorts the whole column.
+    v = df["view_count"].to_numpy()
+    k = min(n, v.size)
+    idx = np.argpartition(v, v.size - k)[v.size - k :] if k else np.array([], dtype=np.intp)
+    idx = idx[np.argsort(-v[idx], kind="stable")]
+    top = df.iloc[idx][["title", "view_count", "video_id", "month"]].copy()
+    # StringDtype concat runs in C over one buffer, not per-element PyUnicode.
+    top["url"] = "https://youtu.be/" + top["video_id"].astype("string")
     return top.reset_index(drop=True)
 
 
 def to_excel(raw_df, summary_df, bracket_df, top_df) -> bytes:
+    sheets = (
+        # is_short is an internal helper column; keep the sheet schema stable.
+        ("Raw Data", raw_df.drop(columns="is_short")),
+        ("Monthly Summary", summary_df),
+        ("View Brackets", bracket_df),
+        ("Top 20 Videos", top_df),
+    )
     with BytesIO() as bio:
-        with pd.ExcelWriter(bio, engine="xlsxwriter") as xw:
-            raw_df.to_excel(xw, sheet_name="Raw Data", index=False)
-            summary_df.to_excel(xw, sheet_name="Monthly Summary", index=False)
-            bracket_df.to_excel(xw, sheet_name="View Brackets", index=False)
-            top_df.to_excel(xw, sheet_name="Top 20 Videos", index=False)
-        bio.seek(0)
-        return bio.read()
+        with pd.ExcelWriter(
+            bio,
+            engine="xlsxwriter",
+            engine_kwargs={
+                "options": {
+                    # Flush rows to disk as written instead of buffering the
+                    # whole workbook; URL auto-detection is a string-heavy cost.
+                    "constant_memory": True,
+                    "strings_to_urls": False,
+                    "default_date_format": "yyyy-mm-dd",
+                }
+            },
+        ) as xw:
+            for name, df in sheets:
+                ws = xw.book.add_worksheet(name)
+                ws.write_row(0, 0, df.columns)
+                for r, row in enumerate(df.itertuples(index=False, name=None), start=1):
+                    ws.write_row(r, 0, row)
+        return bio.getvalue()
 
 # ---------- UI ----------
 st.set_page_config(page_title="YT Analyzer", page_icon="📊", layout="centered")
@@ -148,6 +344,8 @@ with st.sidebar:
         )
 
     run = st.button("Run analysis")
+    if st.button("Clear cache"):
+        st.cache_data.clear()
 
 if run:
     if not api_key or not channel_input:
@@ -158,14 +356,16 @@ if run:
     if "youtube.com" in cid:
         cid = cid.split("/")[-1]
 
-    yt = build("youtube", "v3", developerKey=api_key)
+    yt = get_yt_client(api_key)
+    # Cache key for API responses; never put the raw key in the cache.
+    key_hash = hashlib.sha256(api_key.encode()).hexdigest()
 
     st.info("Fetching videos…")
-    ids = get_all_video_ids(yt, cid)
+    ids = get_all_video_ids(yt, key_hash, cid, start_date, end_date)
     st.write(f"Total videos: {len(ids)}")
 
     st.info("Collecting details…")
-    data = get_video_details(yt, ids, short_limit)
+    data = get_video_details(yt, key_hash, tuple(ids), short_limit)
     data = data[(data["published_date"] >= start_date) & (data["published_date"] <= end_date)].reset_index(drop=True)
 
     if data.empty:
@@ -175,14 +375,27 @@ if run:
     brackets = DEFAULT_VIEW_BRACKETS
     if vb_opt:
         try:
-            custom_br = eval(viewbr_text)
-            if isinstance(custom_br, dict):
+            # literal_eval, not eval: the text area must stay data, not code.
+            try:
+                custom_br = ast.literal_eval(viewbr_text)
+            except (ValueError, SyntaxError):
+                # A bare inf token (repr of float("inf")) is not a literal;
+                # retry with it spelled as one. Only this retry can touch
+                # names, and only when the raw text fails to parse at all.
+                custom_br = ast.literal_eval(re.sub(r"\binf\b", "1e999", viewbr_text))
+            if isinstance(custom_br, dict) and all(
+                isinstance(v, (list, tuple))
+                and len(v) == 2
+                and all(isinstance(b, (int, float)) for b in v)
+                for v in custom_br.values()
+            ):
                 brackets = {k: tuple(v) for k, v in custom_br.items()}
-        except Exception:
+            else:
+                st.warning("Invalid custom brackets; using defaults")
+        except (ValueError, SyntaxError):
             st.warning("Invalid custom brackets; using defaults")
 
-    summary = monthly_summary(data)
-    bracket_df = view_bracket_split(data, brackets)
+    summary, bracket_df = monthly_reports(data, brackets)
     top20 = top_n(data)
 
     excel = to_excel(data, summary, bracket_df, top20)